@@ -0,0 +1,337 @@
+"""
+On-disk HTTP cache with conditional GET, for pages and files that rarely change.
+
+Bodies are stored per URL together with their ETag / Last-Modified
+validators. The next GET of the same URL sends If-None-Match /
+If-Modified-Since; on 304 Not Modified the stored body is returned as if
+the server had sent it, so a refresh of unchanged files costs one small
+round trip each. Responses without validators are not cached.
+
+Presigned URLs (S3 and similar) carry a new signature on every run, so the
+signing query parameters are left out of the cache key: the same object
+keeps the same entry.
+
+With stream=True nothing is read up front: a cached body is streamed from
+its file, and a downloaded one is stored as the caller reads it (only once
+read to the end), so a large file is never held in memory.
+
+The cache is bounded: when stored bodies exceed max_bytes, the least
+recently used entries are deleted. Temporary files left by an
+interrupted run are deleted when the cache is opened. Safe to share
+between threads (one process per directory).
+
+Usage:
+    from http_cache import HttpCache
+
+    cache = HttpCache(".http_cache", max_bytes=512 * 2**20)
+    response = cache.get(http, url, timeout=30)   # http is an HttpClient
+    with cache.get(http, url, stream=True) as response:
+        for chunk in response.iter_content(64 * 1024):
+            ...
+    print(cache.summary())
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Iterator, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+if TYPE_CHECKING:
+    import requests
+
+    from http_client import HttpClient
+
+# Upper bound for all stored bodies together
+DEFAULT_MAX_BYTES = 512 * 2**20
+# Query parameters that sign a URL rather than name a resource (lowercased)
+SIGNING_PARAMS = frozenset({
+    "x-amz-algorithm", "x-amz-credential", "x-amz-date", "x-amz-expires", "x-amz-signedheaders",
+    "x-amz-signature", "x-amz-security-token", "awsaccesskeyid", "signature", "expires",
+})
+# Response headers kept with a cached body
+STORED_HEADERS = ("content-type", "etag", "last-modified")
+# Read size for streamed bodies when the caller does not ask for one
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def cache_key(url: str) -> str:
+    """Stable key for url: the URL without signing parameters, hashed."""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SIGNING_PARAMS]
+    stable = urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+    return hashlib.sha256(stable.encode("utf-8")).hexdigest()
+
+
+class HttpCache:
+    """Directory of <key>.body files plus <key>.json metadata, evicted LRU by body mtime."""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.revalidated = 0
+        self.downloaded = 0
+        self.evicted = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        # Bodies still being written when an earlier run was interrupted
+        for tmp in self.directory.glob(".tmp-*"):
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+        self._size = sum(path.stat().st_size for path in self.directory.glob("*.body"))
+
+    def get(self, http: "HttpClient", url: str, headers: Optional[Dict[str, str]] = None,
+            **kwargs: Any) -> "requests.Response":
+        """GET url through http, revalidating a cached copy when there is one.
+
+        Returns the server's response, or on 304 a 200 response rebuilt
+        from the cache; callers can't tell the difference. Pass stream=True
+        to read the body in chunks (iter_content) and close the response
+        when done.
+        """
+        stream = kwargs.get("stream", False)
+        key = cache_key(url)
+        meta = self._load_meta(key)
+        request_headers = dict(headers or {})
+        if meta is not None:
+            if meta.get("etag"):
+                request_headers["If-None-Match"] = meta["etag"]
+            if meta.get("last-modified"):
+                request_headers["If-Modified-Since"] = meta["last-modified"]
+        response = http.get(url, headers=request_headers, **kwargs)
+
+        if response.status_code == 304 and meta is not None:
+            response.close()
+            body = self._open_body(key) if stream else self._read_body(key)
+            if body is not None:
+                size = os.fstat(body.fileno()).st_size if stream else len(body)
+                with self._lock:
+                    self.revalidated += 1
+                    self.bytes_saved += size
+                return _rebuild_response(url, meta, body)
+            # Evicted in the meantime: fetch it in full
+            response = http.get(url, headers=headers, **kwargs)
+
+        with self._lock:
+            self.downloaded += 1
+        if response.status_code == 200 and (response.headers.get("etag") or response.headers.get("last-modified")):
+            if not stream:
+                self._store(key, url, response)
+            elif int(response.headers.get("content-length") or 0) <= self.max_bytes:
+                response.raw = _CachingReader(self, key, _stored_meta(url, response), response.raw)
+        return response
+
+    def summary(self) -> str:
+        return (f"HTTP cache: {self.revalidated} unchanged (304), {self.downloaded} downloaded, "
+                f"{self.bytes_saved / 2**20:.1f} MB not re-downloaded, {self.evicted} evicted, "
+                f"{self._size / 2**20:.1f}/{self.max_bytes / 2**20:g} MB used")
+
+    def _paths(self, key: str):
+        return self.directory / f"{key}.body", self.directory / f"{key}.json"
+
+    def _load_meta(self, key: str) -> Optional[Dict[str, str]]:
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if body_path.exists() else None
+
+    def _open_body(self, key: str) -> Optional[BinaryIO]:
+        body_path, _ = self._paths(key)
+        try:
+            body = open(body_path, "rb")
+            os.utime(body_path)
+        except OSError:
+            return None
+        return body
+
+    def _read_body(self, key: str) -> Optional[bytes]:
+        body_path, _ = self._paths(key)
+        try:
+            body = body_path.read_bytes()
+            # Mark as recently used for eviction
+            os.utime(body_path)
+        except OSError:
+            return None
+        return body
+
+    def _store(self, key: str, url: str, response: "requests.Response") -> None:
+        body = response.content
+        if len(body) > self.max_bytes:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._commit(key, _stored_meta(url, response), tmp, len(body))
+
+    def _commit(self, key: str, meta: Dict[str, str], tmp: str, size: int) -> None:
+        """Move a body written to tmp into place, with its metadata."""
+        body_path, meta_path = self._paths(key)
+        with self._lock:
+            previous = body_path.stat().st_size if body_path.exists() else 0
+            os.replace(tmp, body_path)
+            _write_atomic(meta_path, json.dumps(meta, sort_keys=True).encode("utf-8"))
+            self._size += size - previous
+            self._evict(keep=body_path)
+
+    def _evict(self, keep: Path) -> None:
+        """Delete least recently used entries until the bodies fit in max_bytes (lock held)."""
+        if self._size <= self.max_bytes:
+            return
+        bodies = []
+        for path in self.directory.glob("*.body"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            bodies.append((stat.st_mtime, stat.st_size, path))
+        for _, size, path in sorted(bodies, key=lambda item: item[0]):
+            if self._size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            for stale in (path, path.with_suffix(".json")):
+                try:
+                    stale.unlink()
+                except OSError:
+                    pass
+            self._size -= size
+            self.evicted += 1
+
+
+class _CachingReader:
+    """Raw body of a streamed response that stores what the caller reads.
+
+    Chunks are passed through and appended to a temporary file; when the
+    body has been read to the end, the file becomes the cache entry. A body
+    closed early, or growing past max_bytes, is not cached.
+    """
+
+    def __init__(self, cache: HttpCache, key: str, meta: Dict[str, str], raw: Any):
+        self._cache = cache
+        self._key = key
+        self._meta = meta
+        self._raw = raw
+        self._chunks: Optional[Iterator[bytes]] = None
+        fd, self._tmp = tempfile.mkstemp(dir=cache.directory, prefix=".tmp-")
+        self._file: Optional[BinaryIO] = os.fdopen(fd, "wb")
+        self._size = 0
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        if self._chunks is None:
+            self._chunks = _raw_chunks(self._raw, amt or STREAM_CHUNK_BYTES)
+        chunk = next(self._chunks, b"")
+        if self._file is None:
+            return chunk
+        if not chunk:
+            self._file.close()
+            self._file = None
+            self._cache._commit(self._key, self._meta, self._tmp, self._size)
+        elif self._size + len(chunk) > self._cache.max_bytes:
+            self._discard()
+        else:
+            self._file.write(chunk)
+            self._size += len(chunk)
+        return chunk
+
+    def close(self) -> None:
+        self._discard()
+        self._raw.close()
+
+    def release_conn(self) -> None:
+        release = getattr(self._raw, "release_conn", None)
+        if release is not None:
+            release()
+
+    def _discard(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        try:
+            os.unlink(self._tmp)
+        except OSError:
+            pass
+
+
+class _CachedBody:
+    """Open cache file used as a response's raw body.
+
+    requests only closes raw on response.close() while the body is unread,
+    but always calls release_conn, so that closes the file too.
+    """
+
+    def __init__(self, file: BinaryIO):
+        self._file = file
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        return self._file.read(-1 if amt is None else amt)
+
+    def close(self) -> None:
+        self._file.close()
+
+    release_conn = close
+
+
+def _raw_chunks(raw: Any, chunk_size: int) -> Iterator[bytes]:
+    """Decoded chunks of a urllib3 response (or any file-like object)."""
+    if hasattr(raw, "stream"):
+        yield from raw.stream(chunk_size, decode_content=True)
+        return
+    while True:
+        chunk = raw.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _stored_meta(url: str, response: "requests.Response") -> Dict[str, str]:
+    meta = {name: response.headers[name] for name in STORED_HEADERS if response.headers.get(name)}
+    meta["url"] = url
+    return meta
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write via a temporary file and rename, so readers never see a partial file."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _rebuild_response(url: str, meta: Dict[str, str], body: Union[bytes, BinaryIO]) -> "requests.Response":
+    """A 200 requests.Response carrying a cached body (bytes, or an open file
+    to stream) and its stored headers."""
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.headers = CaseInsensitiveDict({name: meta[name] for name in STORED_HEADERS if name in meta})
+    response.headers["x-cache"] = "revalidated"
+    response.encoding = get_encoding_from_headers(response.headers)
+    if isinstance(body, bytes):
+        response._content = body
+    else:
+        response.raw = _CachedBody(body)
+    return response
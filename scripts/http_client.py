@@ -0,0 +1,381 @@
+"""
+Shared HTTP client for the scripts in this directory.
+
+One requests.Session per client keeps keep-alive connections open, so
+repeated calls to the same host (auth admin API, PostgREST, storage, FBLA
+pages and PDFs) skip TCP and TLS setup. Transient failures - connection
+errors, timeouts, 429 and 5xx responses - are retried with jittered
+exponential backoff, waiting for Retry-After when the server sends one.
+
+An AdaptiveLimiter caps requests in flight to one class of endpoint and
+tunes that cap from feedback (AIMD): it grows while responses stay fast
+and un-throttled, and halves on a 429/503, a timeout or a latency spike.
+host_limits adds fixed politeness caps per host (or host suffix), shared
+by every thread using the client.
+
+Usage:
+    from http_client import AdaptiveLimiter, HttpClient
+
+    http = HttpClient(pool_size=32, limiter=AdaptiveLimiter("auth admin", initial=8, max_limit=32))
+    response = http.get(url, headers=headers, timeout=10)
+"""
+
+import contextlib
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+# requests is imported by HttpClient itself, so importing this module is cheap
+if TYPE_CHECKING:
+    import requests
+
+    from telemetry import Telemetry
+
+# Responses worth retrying: rate limiting and server-side failures
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Retries after the first attempt
+DEFAULT_RETRIES = 4
+# Base delay in seconds; attempt n waits up to DEFAULT_BACKOFF * 2**n
+DEFAULT_BACKOFF = 0.5
+# Upper bound for any single wait, including Retry-After
+MAX_BACKOFF = 60.0
+# Responses that mean "slow down" to an AdaptiveLimiter
+THROTTLE_STATUSES = frozenset({429, 503})
+# A response slower than this multiple of the healthy baseline counts as congestion
+LATENCY_TOLERANCE = 2.5
+# Healthy responses needed before latency spikes are judged
+LATENCY_WARMUP = 5
+
+
+def retry_after_seconds(response: Optional["requests.Response"]) -> Optional[float]:
+    """Seconds requested by a Retry-After header (delta or HTTP date), if any."""
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt: int, response: Optional["requests.Response"] = None,
+                  backoff: float = DEFAULT_BACKOFF) -> float:
+    """Wait before retry number attempt (0-based).
+
+    Retry-After wins when present; otherwise "full jitter": a uniform draw
+    from [0, backoff * 2**attempt], so concurrent workers spread out.
+    """
+    requested = retry_after_seconds(response)
+    if requested is not None:
+        return min(requested, MAX_BACKOFF)
+    return random.uniform(0, min(backoff * 2 ** attempt, MAX_BACKOFF))
+
+
+class LimiterSlot:
+    """One request's claim on an AdaptiveLimiter; set throttled to report congestion."""
+
+    def __init__(self):
+        self.throttled = False
+
+
+class AdaptiveLimiter:
+    """AIMD limit on concurrent requests to one class of endpoint.
+
+    Every healthy response adds 1/limit to the limit (about +1 per round
+    trip of the whole window) up to max_limit. A throttled response or one
+    slower than LATENCY_TOLERANCE x the healthy baseline halves it, at most
+    once per window: responses to requests sent before the last cut are not
+    counted again. Baselines are kept per request kind (e.g. "GET" or
+    "insert:likes"), since a bulk insert is expected to be slower than a
+    lookup. Callers size their worker pools to max_limit and let slot()
+    decide how many actually run.
+    """
+
+    def __init__(self, name: str, initial: int = 4, min_limit: int = 1, max_limit: int = 64):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, initial)
+        self.limit = float(initial)
+        self.in_flight = 0
+        self.peak = 0
+        self.requests = 0
+        self.throttled = 0
+        self.cuts = 0
+        # kind -> [healthy latency EWMA, healthy responses seen]
+        self._baselines: Dict[Optional[str], list] = {}
+        self._last_cut = 0.0
+        self._cond = threading.Condition()
+
+    def configure(self, initial: int, max_limit: int) -> int:
+        """Set the starting limit (if nothing was sent yet) and the ceiling.
+
+        The ceiling replaces the previous one, lower or higher, and a
+        current limit above it is cut down to it. Returns the ceiling, which
+        is how many workers callers should run.
+        """
+        with self._cond:
+            self.max_limit = max(self.min_limit, max_limit, initial)
+            if self.requests == 0 and self.in_flight == 0:
+                self.limit = float(max(self.min_limit, initial))
+            self.limit = min(self.limit, float(self.max_limit))
+            self._cond.notify_all()
+            return self.max_limit
+
+    def acquire(self) -> float:
+        """Wait for a free slot; returns the send time to pass to release."""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            return time.monotonic()
+
+    def release(self, started: float, throttled: bool = False, kind: Optional[str] = None) -> None:
+        now = time.monotonic()
+        latency = now - started
+        with self._cond:
+            self.in_flight -= 1
+            self.requests += 1
+            self.throttled += throttled
+            baseline = self._baselines.setdefault(kind, [latency, 0])
+            slow = not throttled and baseline[1] >= LATENCY_WARMUP and latency > LATENCY_TOLERANCE * baseline[0]
+            if throttled or slow:
+                if started >= self._last_cut:
+                    self.limit = max(float(self.min_limit), self.limit / 2)
+                    self._last_cut = now
+                    self.cuts += 1
+            else:
+                baseline[0] = 0.9 * baseline[0] + 0.1 * latency
+                baseline[1] += 1
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, kind: Optional[str] = None):
+        """Hold a slot for one request: with limiter.slot() as slot: ..."""
+        started = self.acquire()
+        claim = LimiterSlot()
+        try:
+            yield claim
+        finally:
+            self.release(started, claim.throttled, kind)
+
+    def summary(self) -> str:
+        return (f"{self.name}: settled at {int(self.limit)} in flight "
+                f"(peak {self.peak}, {self.requests} requests, {self.throttled} throttled, {self.cuts} cut-backs)")
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """True for a client-library exception that means "slow down".
+
+    Covers errors raised by supabase-py/postgrest/storage for 429 or 503
+    responses and rate-limit messages from the API gateway. The server
+    turned these requests away, so they are safe to send again.
+    """
+    status = str(getattr(error, "code", None) or getattr(error, "status", None) or getattr(error, "status_code", None) or "")
+    text = str(error).lower()
+    return status in ("429", "503") or "too many requests" in text or "rate limit" in text
+
+
+def is_timeout_error(error: Exception) -> bool:
+    """True for a client-library timeout: the server may or may not have acted on the request."""
+    return "timeout" in type(error).__name__.lower()
+
+
+def call_limited(limiter: AdaptiveLimiter, fn, kind: Optional[str] = None,
+                 retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF):
+    """Call fn() holding one of limiter's slots, for requests made by client libraries.
+
+    Throttling errors (see is_throttle_error) are reported to the limiter
+    and retried with backoff. Timeouts are reported but raised: an insert
+    may have been committed before the response was lost, and sending it
+    again would duplicate its rows. Anything else is raised at once. kind
+    groups requests of similar cost for latency judgement.
+    """
+    for attempt in range(retries + 1):
+        with limiter.slot(kind) as slot:
+            try:
+                return fn()
+            except Exception as e:
+                retry = is_throttle_error(e)
+                slot.throttled = retry or is_timeout_error(e)
+                if not retry or attempt == retries:
+                    raise
+        time.sleep(backoff_delay(attempt, backoff=backoff))
+
+
+def _release_on_close(response: "requests.Response", release) -> None:
+    """Make response.close() (also called by its with block) call release, once."""
+    close = response.close
+    released = threading.Event()
+
+    def close_and_release() -> None:
+        try:
+            close()
+        finally:
+            if not released.is_set():
+                released.set()
+                release()
+
+    response.close = close_and_release
+
+
+class HttpClient:
+    """Pooled requests.Session with retry and backoff on transient failures.
+
+    Safe to share between threads. pool_size is the number of keep-alive
+    connections kept per host; size it to the number of threads calling
+    the client (see ensure_pool_size). With a limiter, every attempt holds
+    one of its slots; backoff sleeps happen outside the slot. With a
+    telemetry collector, every attempt (including retries) is recorded.
+    host_limits maps a host name, or a ".suffix" matching many hosts, to the
+    number of requests allowed in flight to it at once. A streamed response
+    (stream=True) keeps its host slot until it is closed, so its body counts
+    against the limit too: close it, or use it in a with block.
+    """
+
+    def __init__(self, pool_size: int = 10, retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF,
+                 retry_statuses: Iterable[int] = RETRY_STATUSES, headers: Optional[dict] = None,
+                 limiter: Optional[AdaptiveLimiter] = None, telemetry: Optional["Telemetry"] = None,
+                 host_limits: Optional[Dict[str, int]] = None):
+        import requests
+        self.retries = retries
+        self.limiter = limiter
+        self.telemetry = telemetry
+        self._host_slots = {host: threading.BoundedSemaphore(max(1, limit))
+                            for host, limit in (host_limits or {}).items()}
+        self.backoff = backoff
+        self.retry_statuses = frozenset(retry_statuses)
+        self.session = requests.Session()
+        self._transient_errors = (requests.ConnectionError, requests.Timeout)
+        if headers:
+            self.session.headers.update(headers)
+        self.pool_size = 0
+        self._lock = threading.Lock()
+        self.ensure_pool_size(pool_size)
+
+    def ensure_pool_size(self, pool_size: int) -> None:
+        """Grow the per-host connection pool to at least pool_size."""
+        with self._lock:
+            if pool_size <= self.pool_size:
+                return
+            from requests.adapters import HTTPAdapter
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+            self.pool_size = pool_size
+
+    def request(self, method: str, url: str, **kwargs) -> "requests.Response":
+        """Send a request, retrying transient failures.
+
+        Returns the last response once it is not retryable or retries are
+        exhausted (callers check the status as usual); re-raises the last
+        connection error or timeout. A file-like data body is rewound
+        before each retry, so uploads can stream from disk.
+        """
+        body = kwargs.get("data")
+        start = body.tell() if hasattr(body, "seek") else None
+        for attempt in range(self.retries + 1):
+            if attempt and start is not None:
+                body.seek(start)
+            try:
+                response = self._send(method, url, **kwargs)
+            except self._transient_errors:
+                if attempt == self.retries:
+                    raise
+                time.sleep(backoff_delay(attempt, backoff=self.backoff))
+                continue
+            if response.status_code not in self.retry_statuses or attempt == self.retries:
+                return response
+            delay = backoff_delay(attempt, response, self.backoff)
+            response.close()
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def _host_slot(self, url: str):
+        """The politeness semaphore covering url's host, or a no-op context."""
+        host = urlsplit(url).hostname or ""
+        for pattern, slot in self._host_slots.items():
+            if host == pattern or (pattern.startswith(".") and host.endswith(pattern)):
+                return slot
+        return contextlib.nullcontext()
+
+    def _send(self, method: str, url: str, **kwargs) -> "requests.Response":
+        slot = self._host_slot(url)
+        if not kwargs.get("stream") or not isinstance(slot, threading.BoundedSemaphore):
+            with slot:
+                return self._send_limited(method, url, **kwargs)
+        # The body is read after we return: hold the slot until the response is closed
+        slot.acquire()
+        try:
+            response = self._send_limited(method, url, **kwargs)
+        except BaseException:
+            slot.release()
+            raise
+        _release_on_close(response, slot.release)
+        return response
+
+    def _send_limited(self, method: str, url: str, **kwargs) -> "requests.Response":
+        if self.limiter is None:
+            return self._timed(method, url, **kwargs)
+        with self.limiter.slot(method.upper()) as slot:
+            try:
+                response = self._timed(method, url, **kwargs)
+            except self._transient_errors:
+                slot.throttled = True
+                raise
+            slot.throttled = response.status_code in THROTTLE_STATUSES
+            return response
+
+    def _timed(self, method: str, url: str, **kwargs) -> "requests.Response":
+        """One attempt, recorded with the telemetry collector if there is one."""
+        if self.telemetry is None:
+            return self.session.request(method, url, **kwargs)
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except Exception as e:
+            self.telemetry.record(method, url, time.perf_counter() - started, error=e)
+            raise
+        request = response.request
+        body = request.body if request is not None else None
+        # A streamed (generator or file) request body counts by its declared length
+        sent = (len(body) if isinstance(body, (bytes, str))
+                else int(request.headers.get("content-length") or 0) if request is not None else 0)
+        if kwargs.get("stream"):
+            # Don't read a streamed body here; trust the declared length
+            received, body = int(response.headers.get("content-length") or 0), None
+        else:
+            body = response.content
+            received = len(body)
+        self.telemetry.record(method, url, time.perf_counter() - started, sent=sent, received=received,
+                              status=response.status_code, body=body)
+        return response
+
+    def get(self, url: str, **kwargs) -> "requests.Response":
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> "requests.Response":
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> "requests.Response":
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> "requests.Response":
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
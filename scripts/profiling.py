@@ -0,0 +1,195 @@
+"""
+CPU and memory profiling per stage, for finding hot spots without editing code.
+
+A StageProfiler runs cProfile and tracemalloc around named stages (a seed
+stage, a table being loaded, a generated family). Entering the same stage
+again adds to its totals. write_reports() then writes, per stage:
+
+    <dir>/<NN>-<stage>.prof   cProfile stats (pstats, snakeviz, gprof2dot)
+    <dir>/<NN>-<stage>.txt    top-N functions by own and cumulative time,
+                              top-N source lines by memory allocated
+
+Only one stage can be profiled at a time: cProfile sees the thread that
+entered the stage (plus, under asyncio, every task on that loop) and
+measures wall time there, so waits on locks and sockets show up too;
+tracemalloc counts allocations from the whole process. Callers run stages
+one after another while profiling.
+
+Usage:
+    from profiling import StageProfiler
+
+    profiler = StageProfiler()
+    profiler.enable("seed_profile", top=25)
+    with profiler.stage("chats"):
+        ...
+    profiler.write_reports()
+"""
+
+import contextlib
+import io
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+# cProfile, pstats and tracemalloc are imported by enable(), so a disabled
+# profiler costs nothing
+if TYPE_CHECKING:
+    import cProfile
+
+# Functions and source lines listed per report section
+DEFAULT_TOP = 25
+# Stack depth recorded per allocation; 1 attributes memory to the allocating line
+TRACE_FRAMES = 1
+
+
+class StageTotals:
+    """Accumulated profile of one stage name."""
+
+    def __init__(self, index: int, profile: "cProfile.Profile"):
+        self.index = index
+        self.profile = profile
+        self.seconds = 0.0
+        self.entries = 0
+        self.peak_bytes = 0
+        # (filename, lineno) -> [bytes allocated and still live, allocations]
+        self.allocations: Dict[Tuple[str, int], List[int]] = {}
+
+
+class StageProfiler:
+    """Per-stage cProfile + tracemalloc collector; stage() is a no-op until enable()."""
+
+    def __init__(self):
+        self.enabled = False
+        self.out_dir: Optional[Path] = None
+        self.top = DEFAULT_TOP
+        self._stages: Dict[str, StageTotals] = {}
+        # Held for the whole stage: a second profiled stage would blur both
+        self._active = threading.Lock()
+
+    def enable(self, out_dir: str, top: int = DEFAULT_TOP) -> None:
+        """Start tracing allocations; stages entered from now on are profiled."""
+        import tracemalloc
+        self.out_dir = Path(out_dir)
+        self.top = max(1, top)
+        self.enabled = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Profile CPU time and allocations of the block under stage name."""
+        if not self.enabled:
+            yield
+            return
+        import cProfile
+        import tracemalloc
+        with self._active:
+            totals = self._stages.get(name)
+            if totals is None:
+                totals = self._stages[name] = StageTotals(len(self._stages) + 1, cProfile.Profile())
+            before = _snapshot()
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            started = time.perf_counter()
+            totals.profile.enable()
+            try:
+                yield
+            finally:
+                totals.profile.disable()
+                totals.seconds += time.perf_counter() - started
+                totals.entries += 1
+                totals.peak_bytes = max(totals.peak_bytes, tracemalloc.get_traced_memory()[1] - baseline)
+                # Traces are filtered as statistics: Snapshot.filter_traces is
+                # slow on the ~10^5 traces Faker alone leaves behind
+                for stat in _snapshot().compare_to(before, "lineno"):
+                    frame = stat.traceback[0]
+                    if stat.size_diff > 0 and _is_own_allocation(frame.filename):
+                        entry = totals.allocations.setdefault((frame.filename, frame.lineno), [0, 0])
+                        entry[0] += stat.size_diff
+                        entry[1] += max(0, stat.count_diff)
+
+    def write_reports(self) -> List[Path]:
+        """Write the .prof and .txt files for every profiled stage; returns the .txt paths."""
+        if not self.enabled or not self._stages:
+            return []
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        written = []
+        for name, totals in self._stages.items():
+            stem = self.out_dir / f"{totals.index:02d}-{_file_name(name)}"
+            totals.profile.dump_stats(f"{stem}.prof")
+            with open(f"{stem}.txt", "w", encoding="utf-8") as f:
+                f.write(self._report(name, totals))
+            written.append(Path(f"{stem}.txt"))
+        return written
+
+    def print_summary(self) -> None:
+        """Print per-stage wall time, time seen by cProfile, peak memory and top hot spot."""
+        if not self.enabled or not self._stages:
+            return
+        print(f"Profile ({self.out_dir}):")
+        print(f"  {'stage':20s} {'wall':>8s} {'profiled':>8s} {'peak':>9s}  hottest function (own time)")
+        for name, totals in sorted(self._stages.items(), key=lambda item: -item[1].seconds):
+            stats = _stats(totals.profile)
+            hottest = max(stats.stats.items(), key=lambda item: item[1][2], default=None)
+            label = f"{_function_label(hottest[0])} {hottest[1][2]:.2f}s" if hottest else "-"
+            print(f"  {name:20s} {totals.seconds:7.2f}s {stats.total_tt:7.2f}s "
+                  f"{totals.peak_bytes / 2**20:7.1f}MB  {label}")
+
+    def _report(self, name: str, totals: StageTotals) -> str:
+        out = io.StringIO()
+        stats = _stats(totals.profile, out)
+        allocated = sum(size for size, _ in totals.allocations.values())
+        out.write(f"Stage: {name}\n")
+        out.write(f"Entered {totals.entries}x, {totals.seconds:.3f}s wall, "
+                  f"{stats.total_tt:.3f}s in profiled functions (the stage's thread, or its event loop)\n")
+        out.write(f"Memory: {allocated / 2**20:.1f} MB allocated and still live at stage end, "
+                  f"peak {totals.peak_bytes / 2**20:.1f} MB above the stage start\n\n")
+
+        out.write(f"== Top {self.top} functions by own time ==\n")
+        stats.sort_stats("tottime").print_stats(self.top)
+        out.write(f"== Top {self.top} functions by cumulative time ==\n")
+        stats.sort_stats("cumulative").print_stats(self.top)
+
+        out.write(f"== Top {self.top} lines by memory still allocated at stage end ==\n")
+        ranked = sorted(totals.allocations.items(), key=lambda item: -item[1][0])[:self.top]
+        for (filename, lineno), (size, count) in ranked:
+            out.write(f"{size / 1024:12.1f} KiB {count:10d} blocks  {_short_path(filename)}:{lineno}\n")
+        if not ranked:
+            out.write("(none)\n")
+        return out.getvalue()
+
+
+def _snapshot():
+    import tracemalloc
+    return tracemalloc.take_snapshot()
+
+
+def _is_own_allocation(filename: str) -> bool:
+    """False for memory held by tracemalloc itself or by the import system."""
+    import tracemalloc
+    return filename != tracemalloc.__file__ and not filename.startswith(("<frozen importlib", "<unknown>"))
+
+
+def _stats(profile: "cProfile.Profile", stream: Optional[io.StringIO] = None):
+    import pstats
+    stats = pstats.Stats(profile, stream=stream or io.StringIO())
+    stats.strip_dirs()
+    return stats
+
+
+def _function_label(key: Tuple[str, int, str]) -> str:
+    filename, lineno, function = key
+    return f"{function} ({os.path.basename(filename)}:{lineno})" if lineno else function
+
+
+def _short_path(filename: str) -> str:
+    """site-packages/... or the file name, instead of a long absolute path."""
+    marker = f"site-packages{os.sep}"
+    return filename.split(marker, 1)[1] if marker in filename else os.path.basename(filename)
+
+
+def _file_name(stage: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", stage).strip("_") or "stage"
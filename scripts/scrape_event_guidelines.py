@@ -5,6 +5,19 @@ FBLA Event Guidelines Web Scraper & Supabase Uploader
 Scrapes official FBLA event guideline PDFs from connect.fbla.org and uploads
 them to Supabase Storage in event-specific folders.
 
+Events flow through a pipeline of stages - resolve the PDF URL, fetch it,
+compare it with the stored copy, upload it, record it in the database - each
+with its own worker threads, joined by bounded queues. PDFs are streamed in
+chunks into spooled temporary files and uploaded from there, so memory per
+event in flight stays at a few chunks whatever the file size. Requests to fbla.org,
+connect.fbla.org and S3 are capped per host (HOST_LIMITS). Pages and PDFs
+are kept in an on-disk cache and revalidated with conditional GETs, so an
+unchanged guideline is not downloaded again. Each PDF's SHA-256 is stored in
+resources.content_sha256 (sql/ADD_RESOURCE_CONTENT_SHA256.sql); a PDF whose
+hash matches is neither re-uploaded nor rewritten in the database. Existing
+rows are loaded with one query up front and changed rows are written in
+bulk, RESOURCE_BATCH_SIZE events per request.
+
 FBLA URL pattern:
   https://connect.fbla.org/headquarters/files/High%20School%20Competitive%20Events%20Resources/
   Individual%20Guidelines/{CategoryFolder}/{EventFilename}.pdf
@@ -13,7 +26,9 @@ Requirements:
     pip install supabase python-dotenv requests beautifulsoup4
 
 Usage:
-    python scripts/scrape_event_guidelines.py [--dry-run] [--events "Accounting,Advanced Accounting"]
+    python scripts/scrape_event_guidelines.py [--dry-run] [--events "Accounting,Advanced Accounting"] [--metrics-out run.json]
+                                              [--resolve-workers 4] [--fetch-workers 4] [--upload-workers 4]
+                                              [--cache-dir DIR] [--cache-max-mb 512] [--no-cache]
     python scripts/scrape_event_guidelines.py --list-events
 
 Environment:
@@ -25,12 +40,15 @@ import os
 import re
 import sys
 import argparse
+import hashlib
+import itertools
+import queue
+import tempfile
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple
 from urllib.parse import quote
 
-import requests
-
 try:
     from supabase import create_client, Client
     from dotenv import load_dotenv
@@ -40,6 +58,13 @@ except ImportError as e:
     print("Run: pip install supabase python-dotenv requests beautifulsoup4")
     sys.exit(1)
 
+from http_cache import DEFAULT_MAX_BYTES, HttpCache
+from http_client import AdaptiveLimiter, HttpClient, call_limited
+from telemetry import Telemetry
+
+if TYPE_CHECKING:
+    import requests
+
 # Project root
 SCRIPT_DIR = Path(__file__).parent.absolute()
 PROJECT_ROOT = SCRIPT_DIR.parent
@@ -56,6 +81,54 @@ BUCKET_NAME = "resources"
 BASE_URL = "https://connect.fbla.org/headquarters/files/High%20School%20Competitive%20Events%20Resources/Individual%20Guidelines"
 EVENT_PAGE_BASE = "https://www.fbla.org/competitive-events"
 
+# Every request to fbla.org, S3, storage and PostgREST, per stage (see --metrics-out)
+telemetry = Telemetry()
+
+# Requests in flight per host, however many fetch workers run: the event
+# pages, the connect.fbla.org file pages and the S3 PDFs they link to
+HOST_LIMITS = {"www.fbla.org": 2, "connect.fbla.org": 2, ".amazonaws.com": 4}
+
+# Worker threads per pipeline stage (URL resolution, PDF fetch, upload and DB)
+DEFAULT_RESOLVE_WORKERS = 4
+DEFAULT_FETCH_WORKERS = 4
+DEFAULT_UPLOAD_WORKERS = 4
+# Events waiting between two stages; bounds the PDFs spooled at once
+STAGE_QUEUE_SIZE = 8
+# Uploaded events whose resource rows are written in one bulk request
+RESOURCE_BATCH_SIZE = 25
+# Rows per request when loading the existing guideline rows
+PREFETCH_PAGE_SIZE = 1000
+
+# PDFs are downloaded and uploaded in chunks of this size; a spooled PDF
+# stays in memory up to PDF_SPOOL_BYTES and moves to a temporary file beyond
+PDF_CHUNK_BYTES = 64 * 1024
+PDF_SPOOL_BYTES = 4 * PDF_CHUNK_BYTES
+# Anything smaller is an error page, not a guideline
+MIN_PDF_BYTES = 500
+# Most of a connect.fbla.org HTML page read while looking for the S3 link
+MAX_PAGE_BYTES = 2 * 2**20
+
+# Keep-alive connections to fbla.org, connect.fbla.org and S3, with retries
+http = HttpClient(pool_size=max(HOST_LIMITS.values()), telemetry=telemetry, host_limits=HOST_LIMITS)
+
+# Conditional-GET cache for event pages and PDFs; set up by main (None: --no-cache)
+DEFAULT_CACHE_DIR = SCRIPT_DIR / ".http_cache"
+http_cache: Optional[HttpCache] = None
+
+
+def http_get(url: str, **kwargs) -> "requests.Response":
+    """GET through the HTTP cache when it is enabled."""
+    if http_cache is None:
+        return http.get(url, **kwargs)
+    return http_cache.get(http, url, **kwargs)
+
+# In-flight limits for the Supabase endpoints, tuned from 429/latency feedback
+storage_limiter = AdaptiveLimiter("storage", initial=4, max_limit=16)
+postgrest_limiter = AdaptiveLimiter("PostgREST", initial=4, max_limit=16)
+
+# Storage REST API client for streamed uploads; storage3 wants the whole file in memory
+storage_http = HttpClient(pool_size=DEFAULT_UPLOAD_WORKERS, limiter=storage_limiter, telemetry=telemetry)
+
 # Map our category names to FBLA connect folder names
 CATEGORY_FOLDER = {
     "Objective Test": "Objective Tests",
@@ -146,6 +219,20 @@ FBLA_EVENTS = [
 ]
 
 
+# The event whose output the current worker thread is collecting (see log)
+_current = threading.local()
+_print_lock = threading.Lock()
+
+
+def log(message: str) -> None:
+    """Add a line to the current event's output, printed when the event finishes."""
+    job = getattr(_current, "job", None)
+    if job is None:
+        print(message)
+    else:
+        job.lines.append(message)
+
+
 def event_name_to_slug(name: str) -> str:
     """Convert event name to URL/filename slug: 'Introduction to FBLA' -> 'Introduction-to-FBLA'."""
     return re.sub(r"\s+", "-", name.strip())
@@ -165,7 +252,7 @@ def get_guideline_url_from_event_page(event_name: str, category: str) -> Optiona
     slug = re.sub(r"&", "", slug)
     url = f"{EVENT_PAGE_BASE}/{slug}/"
     try:
-        resp = requests.get(url, timeout=25, headers={"User-Agent": "FBLA-Engage-Scraper/1.0"})
+        resp = http_get(url, timeout=25, headers={"User-Agent": "FBLA-Engage-Scraper/1.0"})
         resp.raise_for_status()
         soup = BeautifulSoup(resp.text, "html.parser")
         for a in soup.find_all("a", href=True):
@@ -174,7 +261,7 @@ def get_guideline_url_from_event_page(event_name: str, category: str) -> Optiona
                 return href if href.startswith("http") else f"https://connect.fbla.org{href}"
         return None
     except Exception as e:
-        print(f"    [warn] Could not scrape {url}: {e}")
+        log(f"    [warn] Could not scrape {url}: {e}")
         return None
 
 
@@ -189,20 +276,103 @@ def build_direct_pdf_url(event_name: str, category: str) -> str:
     return f"{base}/{folder_enc}/{filename_enc}"
 
 
-def fetch_pdf(url: str) -> Optional[bytes]:
+class SpooledPdf:
+    """A downloaded PDF in a SpooledTemporaryFile, hashed as it is written.
+
+    Reads like a file and len() is the PDF size, so it can be passed to
+    requests as an upload body and streamed without being loaded.
+    """
+
+    def __init__(self):
+        self._file = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_BYTES)
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.sha256: Optional[str] = None
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+        self._hash.update(chunk)
+        self.size += len(chunk)
+
+    def finish(self) -> None:
+        """Seal the hash and rewind for reading."""
+        self.sha256 = self._hash.hexdigest()
+        self._file.seek(0)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(lambda: self.read(PDF_CHUNK_BYTES), b"")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def spool_pdf(response: "requests.Response", chunks: Iterator[bytes]) -> Optional[SpooledPdf]:
+    """Stream a PDF body into a SpooledPdf.
+
+    The %PDF magic and, when the server declares it, the size are checked on
+    the first chunk, so an error page is rejected without reading it.
     """
-    Fetch PDF bytes from URL. connect.fbla.org returns HTML with an S3 presigned link;
-    we parse that and fetch the actual PDF from S3.
+    first = next(chunks, b"")
+    if not first.startswith(b"%PDF"):
+        log("  [fail] Response is not a valid PDF")
+        return None
+    # Content-Length is the decoded size only for an unencoded body
+    declared = None if response.headers.get("content-encoding") else response.headers.get("content-length")
+    if declared is not None and int(declared) < MIN_PDF_BYTES:
+        log(f"  [fail] PDF too small ({declared} bytes)")
+        return None
+    pdf = SpooledPdf()
+    try:
+        for chunk in itertools.chain([first], chunks):
+            pdf.write(chunk)
+    except BaseException:
+        pdf.close()
+        raise
+    if pdf.size < MIN_PDF_BYTES:
+        log(f"  [fail] PDF too small ({pdf.size} bytes)")
+        pdf.close()
+        return None
+    pdf.finish()
+    return pdf
+
+
+def fetch_pdf(url: str) -> Optional[SpooledPdf]:
+    """
+    Download a PDF from URL in chunks. connect.fbla.org returns HTML with an S3 presigned link;
+    we parse that and stream the actual PDF from S3. Logs why when nothing usable is found.
     """
     headers = {"User-Agent": "Mozilla/5.0 (compatible; FBLA-Engage-Scraper/1.0)"}
     try:
-        resp = requests.get(url, timeout=30, allow_redirects=True, headers=headers)
-        resp.raise_for_status()
-        content = resp.content
-
-        # If we got a PDF directly, return it
-        if content.startswith(b"%PDF"):
-            return content
+        with http_get(url, timeout=30, allow_redirects=True, headers=headers, stream=True) as resp:
+            resp.raise_for_status()
+            chunks = resp.iter_content(PDF_CHUNK_BYTES)
+            first = next(chunks, b"")
+
+            # If we got a PDF directly, stream it
+            if first.startswith(b"%PDF"):
+                return spool_pdf(resp, itertools.chain([first], chunks))
+
+            # Otherwise it is an HTML page; read it (up to MAX_PAGE_BYTES)
+            parts = [first]
+            size = len(first)
+            for chunk in chunks:
+                parts.append(chunk)
+                size += len(chunk)
+                if size >= MAX_PAGE_BYTES:
+                    break
+            content = b"".join(parts)
 
         # connect.fbla.org returns HTML with a link to S3 - extract it
         if b"s3" in content.lower() and b"amazonaws" in content.lower():
@@ -210,13 +380,13 @@ def fetch_pdf(url: str) -> Optional[bytes]:
             for a in soup.find_all("a", href=True):
                 href = a["href"]
                 if ".pdf" in href.lower() and "amazonaws" in href:
-                    pdf_resp = requests.get(href, timeout=30, headers=headers)
-                    pdf_resp.raise_for_status()
-                    if pdf_resp.content.startswith(b"%PDF"):
-                        return pdf_resp.content
+                    with http_get(href, timeout=30, headers=headers, stream=True) as pdf_resp:
+                        pdf_resp.raise_for_status()
+                        return spool_pdf(pdf_resp, pdf_resp.iter_content(PDF_CHUNK_BYTES))
+        log("  [fail] No PDF obtained")
         return None
     except Exception as e:
-        print(f"    [warn] Fetch failed: {e}")
+        log(f"  [fail] Fetch failed: {e}")
         return None
 
 
@@ -228,53 +398,363 @@ def ensure_bucket(supabase: Client) -> None:
         supabase.storage.create_bucket(BUCKET_NAME, options={"public": True})
 
 
+def resource_title(event_name: str) -> str:
+    return f"{event_name} Guidelines"
+
+
 def get_storage_path(event_name: str) -> str:
     """Return the storage path within the resources bucket."""
     folder = event_name_to_folder(event_name)
     return f"{folder}/guidelines.pdf"
 
 
-def upload_to_storage(supabase: Client, event_name: str, pdf_bytes: bytes, dry_run: bool) -> bool:
-    """Upload PDF to Supabase storage at resources/{EventName}/guidelines.pdf."""
-    folder = event_name_to_folder(event_name)
-    storage_path = f"{folder}/guidelines.pdf"
+def upload_to_storage(event_name: str, pdf: SpooledPdf, dry_run: bool) -> bool:
+    """Upload PDF to Supabase storage at resources/{EventName}/guidelines.pdf.
+
+    Sent to the storage REST API straight from the spooled file.
+    """
+    storage_path = get_storage_path(event_name)
     if dry_run:
-        print(f"    [dry-run] Would upload to {BUCKET_NAME}/{storage_path} ({len(pdf_bytes)} bytes)")
+        log(f"    [dry-run] Would upload to {BUCKET_NAME}/{storage_path} ({pdf.size} bytes)")
         return True
+    url = f"{SUPABASE_URL.rstrip('/')}/storage/v1/object/{BUCKET_NAME}/{quote(storage_path)}"
+    headers = {
+        "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
+        "apikey": SUPABASE_SERVICE_ROLE_KEY,
+        "Content-Type": "application/pdf",
+        "Cache-Control": "max-age=3600",
+        "x-upsert": "true",
+    }
     try:
-        supabase.storage.from_(BUCKET_NAME).upload(storage_path, pdf_bytes, {"content-type": "application/pdf", "x-upsert": "true"})
+        pdf.seek(0)
+        resp = storage_http.post(url, data=pdf, headers=headers, timeout=120)
+        if resp.status_code >= 400:
+            log(f"    [error] Upload failed: HTTP {resp.status_code} {resp.text[:200]}")
+            return False
+        telemetry.add_rows("storage objects", 1)
         return True
     except Exception as e:
-        print(f"    [error] Upload failed: {e}")
+        log(f"    [error] Upload failed: {e}")
         return False
 
 
-def upsert_resource_in_db(supabase: Client, event_name: str, storage_path: str, dry_run: bool) -> bool:
-    """Upsert the guideline resource into the resources table with storage_path."""
-    title = f"{event_name} Guidelines"
-    description = f"Official FBLA competitive event guidelines for {event_name}."
-    if dry_run:
-        print(f"    [dry-run] Would upsert resource: {title} -> storage_path={storage_path}")
-        return True
+# False once the resources table turns out to lack content_sha256 (migration not run)
+content_hash_supported = True
+
+
+def is_missing_hash_column(error: Exception) -> bool:
+    """True for the PostgREST error about an unknown content_sha256 column."""
+    return "content_sha256" in str(error) and str(getattr(error, "code", "")) in ("42703", "PGRST204")
+
+
+def prefetch_resources(supabase: Client) -> Dict[Tuple[str, str], dict]:
+    """Every existing guideline row, keyed by (event_name, title).
+
+    Rows carry id, storage_path and, when the column exists, content_sha256.
+    One request per PREFETCH_PAGE_SIZE rows, so normally just one.
+    """
+    global content_hash_supported
+    columns = "id, event_name, title, storage_path, content_sha256"
+    rows: List[dict] = []
+    while True:
+        query = supabase.table("resources").select(columns).like("title", "% Guidelines").order("id").range(
+            len(rows), len(rows) + PREFETCH_PAGE_SIZE - 1)
+        try:
+            page = call_limited(postgrest_limiter, query.execute, kind="select").data or []
+        except Exception as e:
+            if not content_hash_supported or not is_missing_hash_column(e):
+                raise
+            content_hash_supported = False
+            columns = "id, event_name, title, storage_path"
+            print("⚠ resources.content_sha256 is missing; run sql/ADD_RESOURCE_CONTENT_SHA256.sql "
+                  "to skip unchanged uploads. Uploading every PDF for now.")
+            continue
+        rows.extend(page)
+        if len(page) < PREFETCH_PAGE_SIZE:
+            break
+    return {(row["event_name"], row["title"]): row for row in rows if row.get("event_name")}
+
+
+def resource_row(event_name: str, content_sha256: Optional[str], existing_id: Optional[str]) -> dict:
+    """The resources row for an event's guidelines: a full row for an insert,
+    or the columns to overwrite (with id) for an upsert of an existing one."""
+    row = {
+        "title": resource_title(event_name),
+        "description": f"Official FBLA competitive event guidelines for {event_name}.",
+        "type": "pdf",
+        "url": None,
+        "storage_path": get_storage_path(event_name),
+        "event_name": event_name,
+    }
+    if existing_id:
+        row["id"] = existing_id
+    else:
+        row.update(category_id=None, downloads=0)
+    if content_sha256 and content_hash_supported:
+        row["content_sha256"] = content_sha256
+    return row
+
+
+class EventJob:
+    """One event moving through the pipeline, with the output it has produced."""
+
+    def __init__(self, name: str, category: str):
+        self.name = name
+        self.category = category
+        self.url: Optional[str] = None
+        self.pdf: Optional[SpooledPdf] = None
+        self.size = 0
+        self.sha256: Optional[str] = None
+        self.existing: Optional[dict] = None
+        # "new", "changed" or "unchanged", once known
+        self.outcome: Optional[str] = None
+        # Set by a stage that finished the job early (nothing left to do)
+        self.complete = False
+        self.lines: List[str] = []
+
+
+class PipelineStage:
+    """A pipeline step run by its own worker threads.
+
+    run(job) returns True to pass the job on (or, for the last stage, to count
+    it as done) and False once it has failed; the reason is logged. A stage
+    that leaves nothing for later stages sets job.complete and returns True.
+    """
+
+    def __init__(self, name: str, run: Callable[[EventJob], bool], workers: int = 1):
+        self.name = name
+        self.run = run
+        self.workers = max(1, workers)
+
+
+def run_pipeline(jobs: List[EventJob], stages: List[PipelineStage],
+                 finished: Callable[[EventJob, bool], None], queue_size: int = STAGE_QUEUE_SIZE) -> None:
+    """Push jobs through stages concurrently, calling finished(job, ok) once per job.
+
+    Stages are joined by queues of queue_size jobs, so a slow stage holds
+    back the ones before it instead of letting fetched PDFs pile up. A stage
+    shuts down once every worker of the stage before it has finished.
+    """
+    inboxes: List["queue.Queue[Optional[EventJob]]"] = [queue.Queue(maxsize=max(1, queue_size)) for _ in stages]
+
+    def work(index: int) -> None:
+        stage = stages[index]
+        inbox = inboxes[index]
+        while True:
+            job = inbox.get()
+            if job is None:
+                return
+            _current.job = job
+            try:
+                with telemetry.stage(stage.name):
+                    passed = stage.run(job)
+            except Exception as e:
+                log(f"  [fail] {stage.name}: {e}")
+                passed = False
+            finally:
+                _current.job = None
+            if passed and not job.complete and index + 1 < len(stages):
+                inboxes[index + 1].put(job)
+            else:
+                finished(job, passed)
+
+    threads = [[threading.Thread(target=work, args=(index,), daemon=True) for _ in range(stage.workers)]
+               for index, stage in enumerate(stages)]
+    for stage_threads in threads:
+        for thread in stage_threads:
+            thread.start()
+    for job in jobs:
+        inboxes[0].put(job)
+    # Close each stage once the one before it has drained
+    for index, stage_threads in enumerate(threads):
+        for _ in stage_threads:
+            inboxes[index].put(None)
+        for thread in stage_threads:
+            thread.join()
+
+
+def resolve_stage(job: EventJob) -> bool:
+    """Find the PDF link on the event page, falling back to the presumed connect URL."""
+    job.url = get_guideline_url_from_event_page(job.name, job.category)
+    if not job.url:
+        job.url = build_direct_pdf_url(job.name, job.category)
+        log(f"  Using direct URL: {job.url}")
+    else:
+        log(f"  Found URL from event page: {job.url}")
+    return True
+
+
+def fetch_stage(job: EventJob) -> bool:
+    job.pdf = fetch_pdf(job.url)
+    if job.pdf is None:
+        return False
+    job.size = job.pdf.size
+    job.sha256 = job.pdf.sha256
+    return True
+
+
+class ResourceWriter:
+    """Writes the resource rows of uploaded events in bulk.
+
+    add() queues an event and writes the batch once it holds batch_size
+    events; flush() writes the rest. A batch is one upsert of the rows that
+    exist (by id) and one insert of the new ones. done(job, ok) is called
+    for every event once its request has returned; a failed request is
+    kept in failures with the events it covered.
+    """
+
+    def __init__(self, supabase: Client, dry_run: bool, done: Callable[[EventJob, bool], None],
+                 batch_size: int = RESOURCE_BATCH_SIZE):
+        self.supabase = supabase
+        self.dry_run = dry_run
+        self.done = done
+        self.batch_size = max(1, batch_size)
+        # (request, event names, error) per failed request
+        self.failures: List[Tuple[str, List[str], str]] = []
+        self._pending: List[EventJob] = []
+        self._lock = threading.Lock()
+
+    def add(self, job: EventJob) -> None:
+        with self._lock:
+            self._pending.append(job)
+            if len(self._pending) < self.batch_size:
+                return
+            batch, self._pending = self._pending, []
+        self._write(batch)
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch: List[EventJob]) -> None:
+        updates = [job for job in batch if job.existing]
+        inserts = [job for job in batch if not job.existing]
+        with telemetry.stage("db"):
+            for request, jobs in (("upsert", updates), ("insert", inserts)):
+                if jobs:
+                    self._send(request, jobs)
+
+    def _send(self, request: str, jobs: List[EventJob]) -> None:
+        rows = [resource_row(job.name, job.sha256, job.existing["id"] if job.existing else None) for job in jobs]
+        if self.dry_run:
+            for job, row in zip(jobs, rows):
+                job.lines.append(f"    [dry-run] Would {request} resource: {row['title']} -> "
+                                 f"storage_path={row['storage_path']}")
+                self.done(job, True)
+            return
+        table = self.supabase.table("resources")
+        query = table.upsert(rows, on_conflict="id") if request == "upsert" else table.insert(rows)
+        try:
+            call_limited(postgrest_limiter, query.execute, kind=request)
+        except Exception as e:
+            names = [job.name for job in jobs]
+            with self._lock:
+                self.failures.append((f"{request} of {len(rows)} rows", names, str(e)))
+            for job in jobs:
+                job.lines.append(f"    [error] DB {request} failed (batch of {len(rows)}): {e}")
+                self.done(job, False)
+            return
+        telemetry.add_rows("resources", len(rows))
+        for job in jobs:
+            job.lines.append(f"  [ok] Uploaded {job.size} bytes, DB updated ({job.outcome})")
+            self.done(job, True)
+
+
+def scrape_events(supabase: Client, events_to_process: list, dry_run: bool,
+                  resolve_workers: int = DEFAULT_RESOLVE_WORKERS, fetch_workers: int = DEFAULT_FETCH_WORKERS,
+                  upload_workers: int = DEFAULT_UPLOAD_WORKERS) -> None:
+    """Fetch, upload and record the guidelines PDF of each event, then print the tally.
+
+    Each event's output is printed as one block when it finishes, in
+    completion order; an uploaded event finishes when its row is written.
+    """
+    if not dry_run:
+        with telemetry.stage("bucket"):
+            ensure_bucket(supabase)
+    http.ensure_pool_size(max(resolve_workers, fetch_workers))
+    storage_http.ensure_pool_size(upload_workers)
     try:
-        existing = supabase.table("resources").select("id").eq("event_name", event_name).eq("title", title).limit(1).execute()
-        if existing.data and len(existing.data) > 0:
-            supabase.table("resources").update({"storage_path": storage_path, "url": None, "description": description}).eq("id", existing.data[0]["id"]).execute()
+        with telemetry.stage("prefetch"):
+            existing = prefetch_resources(supabase)
+    except Exception as e:
+        print(f"ERROR: Could not load existing resources: {e}")
+        sys.exit(1)
+
+    def check_stage(job: EventJob) -> bool:
+        """Finish the job early when the stored copy has the same hash."""
+        job.existing = existing.get((job.name, resource_title(job.name)))
+        if job.existing is None:
+            job.outcome = "new"
+        elif (job.existing.get("content_sha256") == job.sha256
+              and job.existing.get("storage_path") == get_storage_path(job.name)):
+            job.outcome = "unchanged"
+            job.complete = True
+            log(f"  [ok] Unchanged (sha256 {job.sha256[:12]}), skipped upload and DB write")
         else:
-            supabase.table("resources").insert({
-                "title": title,
-                "description": description,
-                "type": "pdf",
-                "url": None,
-                "storage_path": storage_path,
-                "event_name": event_name,
-                "category_id": None,
-                "downloads": 0,
-            }).execute()
+            job.outcome = "changed"
         return True
-    except Exception as e:
-        print(f"    [error] DB upsert failed: {e}")
-        return False
+
+    def upload_stage(job: EventJob) -> bool:
+        try:
+            return upload_to_storage(job.name, job.pdf, dry_run)
+        finally:
+            # Uploaded or not, the spooled file is no longer needed
+            job.pdf.close()
+            job.pdf = None
+
+    ok = 0
+    fail = 0
+    failed: List[str] = []
+    outcomes = {"new": 0, "changed": 0, "unchanged": 0}
+
+    def report(job: EventJob, passed: bool) -> None:
+        nonlocal ok, fail
+        if job.pdf is not None:
+            job.pdf.close()
+            job.pdf = None
+        with _print_lock:
+            print(f"\n{job.name} ({job.category})")
+            for line in job.lines:
+                print(line)
+            if passed:
+                ok += 1
+                outcomes[job.outcome] += 1
+            else:
+                fail += 1
+                failed.append(job.name)
+
+    writer = ResourceWriter(supabase, dry_run, report)
+
+    def finished(job: EventJob, passed: bool) -> None:
+        # Uploaded: reported once the batch holding its row is written
+        if passed and not job.complete:
+            writer.add(job)
+        else:
+            report(job, passed)
+
+    jobs = [EventJob(ev["name"], ev["category"]) for ev in events_to_process]
+    run_pipeline(jobs, [
+        PipelineStage("discover", resolve_stage, resolve_workers),
+        PipelineStage("download", fetch_stage, fetch_workers),
+        PipelineStage("check", check_stage),
+        PipelineStage("upload", upload_stage, upload_workers),
+    ], finished)
+    writer.flush()
+
+    print(f"\n--- Done: {ok} ok, {fail} failed ---")
+    print(f"  {outcomes['new']} new, {outcomes['changed']} changed, {outcomes['unchanged']} unchanged")
+    if failed:
+        print(f"  Failed: {', '.join(sorted(failed))}")
+    for request, names, error in writer.failures:
+        print(f"  Failed resources {request}: {error}")
+        print(f"    covering: {', '.join(names)}")
+    for limiter in (storage_limiter, postgrest_limiter):
+        if limiter.requests:
+            print(f"  {limiter.summary()}")
+    if http_cache is not None:
+        print(f"  {http_cache.summary()}")
 
 
 def main() -> None:
@@ -282,6 +762,13 @@ def main() -> None:
     parser.add_argument("--dry-run", action="store_true", help="Do not upload; only fetch and report")
     parser.add_argument("--events", type=str, help="Comma-separated event names to process (default: all)")
     parser.add_argument("--list-events", action="store_true", help="List all events and exit")
+    parser.add_argument("--resolve-workers", type=int, default=DEFAULT_RESOLVE_WORKERS, help=f"Event pages resolved to PDF links at once (default: {DEFAULT_RESOLVE_WORKERS})")
+    parser.add_argument("--fetch-workers", type=int, default=DEFAULT_FETCH_WORKERS, help=f"PDFs downloaded at once; each host is still capped by HOST_LIMITS (default: {DEFAULT_FETCH_WORKERS})")
+    parser.add_argument("--upload-workers", type=int, default=DEFAULT_UPLOAD_WORKERS, help=f"PDFs uploaded at once (default: {DEFAULT_UPLOAD_WORKERS})")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help=f"Directory of the page/PDF cache (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // 2**20, help=f"Size bound of the cache; least recently used files are evicted beyond it (default: {DEFAULT_MAX_BYTES // 2**20})")
+    parser.add_argument("--no-cache", action="store_true", help="Download every page and PDF in full, without reading or writing the cache")
+    parser.add_argument("--metrics-out", metavar="PATH", help="Write a JSON report of request counts, bytes, errors and latency percentiles per stage and endpoint")
     args = parser.parse_args()
 
     if args.list_events:
@@ -301,44 +788,23 @@ def main() -> None:
             print(f"ERROR: No matching events for: {args.events}")
             sys.exit(1)
 
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
-    if not args.dry_run:
-        ensure_bucket(supabase)
-
-    ok = 0
-    fail = 0
-    for ev in events_to_process:
-        name, cat = ev["name"], ev["category"]
-        print(f"\n{name} ({cat})")
-        url = get_guideline_url_from_event_page(name, cat)
-        if not url:
-            url = build_direct_pdf_url(name, cat)
-            print(f"  Using direct URL: {url}")
-        else:
-            print(f"  Found URL from event page: {url}")
+    global http_cache
+    if not args.no_cache:
+        http_cache = HttpCache(args.cache_dir, max_bytes=args.cache_max_mb * 2**20)
 
-        pdf = fetch_pdf(url)
-        if not pdf or len(pdf) < 500:
-            print(f"  [fail] No PDF obtained")
-            fail += 1
-            continue
-        if not pdf.startswith(b"%PDF"):
-            print(f"  [fail] Response is not a valid PDF")
-            fail += 1
-            continue
-
-        if not upload_to_storage(supabase, name, pdf, args.dry_run):
-            fail += 1
-            continue
-
-        storage_path = get_storage_path(name)
-        if upsert_resource_in_db(supabase, name, storage_path, args.dry_run):
-            print(f"  [ok] Uploaded {len(pdf)} bytes, DB updated")
-            ok += 1
-        else:
-            fail += 1
-
-    print(f"\n--- Done: {ok} ok, {fail} failed ---")
+    supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    telemetry.instrument_httpx(supabase.postgrest.session)
+    # The storage client's httpx session (named _client before storage3 0.8)
+    telemetry.instrument_httpx(getattr(supabase.storage, "session", None) or supabase.storage._client)
+    try:
+        scrape_events(supabase, events_to_process, args.dry_run, resolve_workers=args.resolve_workers,
+                      fetch_workers=args.fetch_workers, upload_workers=args.upload_workers)
+    finally:
+        telemetry.print_report()
+        if args.metrics_out:
+            telemetry.write_report(args.metrics_out, command="scrape", argv=sys.argv[1:],
+                                   complete=sys.exc_info()[0] is None)
+            print(f"Metrics written to {args.metrics_out}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,336 @@
+"""
+Request telemetry for the scripts in this directory.
+
+Every HTTP call to PostgREST, the auth admin API, storage or any other host
+is recorded under the stage that made it and a normalized endpoint, e.g.
+"POST /rest/v1/likes", "DELETE /auth/v1/admin/users/{id}" or
+"GET www.fbla.org". Each (stage, endpoint) pair keeps request and error
+counts, bytes sent and received, error classes (HTTP status plus the
+PostgREST/GoTrue error code, or the exception type) and a log-bucketed
+latency histogram for p50/p95/p99. Stages also count the rows they write,
+so the report has rows/s.
+
+The report is printed as a table and can be written as JSON (--metrics-out)
+with sorted keys, so two runs can be diffed.
+
+Usage:
+    from telemetry import Telemetry
+
+    telemetry = Telemetry()
+    telemetry.instrument_httpx(supabase.postgrest.session)
+    with telemetry.stage("likes"):
+        ...
+        telemetry.add_rows("likes", 500)
+    telemetry.print_report()
+    telemetry.write_report("metrics.json", command="seed")
+"""
+
+import contextlib
+import contextvars
+import json
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Relative width of a latency bucket: percentiles are accurate to ~10%
+HISTOGRAM_GROWTH = 1.1
+# Latencies below this many milliseconds share the first bucket
+HISTOGRAM_MIN_MS = 0.1
+# Stage name for requests made outside any telemetry.stage() block
+NO_STAGE = "(no stage)"
+
+_current_stage: "contextvars.ContextVar[str]" = contextvars.ContextVar("telemetry_stage", default=NO_STAGE)
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """Group a request URL into an endpoint: Supabase paths by table, bucket or
+    resource (ids dropped), any other host by host name."""
+    parts = urlsplit(url)
+    segments = [s for s in parts.path.split("/") if s]
+    method = method.upper()
+    if segments[:2] == ["rest", "v1"]:
+        return f"{method} /{'/'.join(segments[:4 if segments[2:3] == ['rpc'] else 3])}"
+    if segments[:2] == ["auth", "v1"]:
+        if segments[2:4] == ["admin", "users"] and len(segments) > 4:
+            return f"{method} /auth/v1/admin/users/{{id}}"
+        return f"{method} /{'/'.join(segments)}"
+    if segments[:2] == ["storage", "v1"]:
+        # /storage/v1/object/<bucket>/<path...> -> per bucket
+        return f"{method} /{'/'.join(segments[:5 if segments[2:3] == ['object'] else 4])}"
+    return f"{method} {parts.hostname or url}"
+
+
+def error_class(status: Optional[int] = None, body: Optional[bytes] = None,
+                error: Optional[BaseException] = None) -> Optional[str]:
+    """"HTTP 409 23505" for an error response, the exception type for a failed request."""
+    if error is not None:
+        return type(error).__name__
+    if status is None or status < 400:
+        return None
+    code = None
+    if body:
+        try:
+            payload = json.loads(body)
+            if isinstance(payload, dict):
+                code = payload.get("code") or payload.get("error_code")
+        except ValueError:
+            pass
+    return f"HTTP {status} {code}" if code else f"HTTP {status}"
+
+
+class LatencyHistogram:
+    """Counts of latencies in buckets HISTOGRAM_GROWTH apart; fixed memory per endpoint."""
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float) -> None:
+        index = math.ceil(math.log(max(ms, HISTOGRAM_MIN_MS) / HISTOGRAM_MIN_MS, HISTOGRAM_GROWTH))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (0 < q <= 1), in ms."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(HISTOGRAM_MIN_MS * HISTOGRAM_GROWTH ** index, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "p50": round(self.percentile(0.50), 2),
+            "p95": round(self.percentile(0.95), 2),
+            "p99": round(self.percentile(0.99), 2),
+            "max": round(self.max, 2),
+            "mean": round(self.total / self.count, 2) if self.count else 0.0,
+            # [bucket upper bound in ms, requests], fastest first
+            "histogram": [[round(HISTOGRAM_MIN_MS * HISTOGRAM_GROWTH ** index, 2), count]
+                          for index, count in sorted(self.buckets.items())],
+        }
+
+
+class RequestStats:
+    """Totals for one (stage, endpoint) pair, or a merge of several."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.error_classes: Dict[str, int] = {}
+        self.latency = LatencyHistogram()
+
+    def add(self, ms: float, sent: int, received: int, failure: Optional[str]) -> None:
+        self.requests += 1
+        self.bytes_sent += sent
+        self.bytes_received += received
+        self.latency.add(ms)
+        if failure:
+            self.errors += 1
+            self.error_classes[failure] = self.error_classes.get(failure, 0) + 1
+
+    def merge(self, other: "RequestStats") -> None:
+        self.requests += other.requests
+        self.errors += other.errors
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+        for name, count in other.error_classes.items():
+            self.error_classes[name] = self.error_classes.get(name, 0) + count
+        self.latency.merge(other.latency)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "error_classes": dict(self.error_classes),
+            "latency_ms": self.latency.to_dict(),
+        }
+
+
+def _body_size(request: Any) -> int:
+    try:
+        return len(request.content or b"")
+    except Exception:
+        # Streaming request body that was never buffered
+        return int(request.headers.get("content-length") or 0)
+
+
+class Telemetry:
+    """Thread-safe collector of request and row metrics, grouped by stage.
+
+    The current stage is a context variable: telemetry.stage() sets it for
+    the enclosed block, including asyncio tasks started inside it. Worker
+    threads do not inherit it; wrap their target with bind().
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.started_at = datetime.now(timezone.utc)
+        self._stats: Dict[Tuple[str, str], RequestStats] = {}
+        self._rows: Dict[str, Dict[str, int]] = {}
+        self._stage_seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Attribute requests and rows in the block to stage name and time it."""
+        token = _current_stage.set(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_stage.reset(token)
+            with self._lock:
+                self._stage_seconds[name] = self._stage_seconds.get(name, 0.0) + elapsed
+
+    @staticmethod
+    def bind(fn):
+        """Wrap fn so it runs under the caller's stage in another thread."""
+        stage = _current_stage.get()
+
+        def run(*args, **kwargs):
+            token = _current_stage.set(stage)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _current_stage.reset(token)
+        return run
+
+    def record(self, method: str, url: str, seconds: float, sent: int = 0, received: int = 0,
+               status: Optional[int] = None, body: Optional[bytes] = None,
+               error: Optional[BaseException] = None) -> None:
+        """Record one request attempt (a response with status, or a failure with error)."""
+        key = (_current_stage.get(), endpoint_name(method, url))
+        failure = error_class(status, body if status is not None and status >= 400 else None, error)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = RequestStats()
+            stats.add(seconds * 1000, sent, received, failure)
+
+    def add_rows(self, table: str, count: int) -> None:
+        """Count rows written to table by the current stage."""
+        if count <= 0:
+            return
+        with self._lock:
+            rows = self._rows.setdefault(_current_stage.get(), {})
+            rows[table] = rows.get(table, 0) + count
+
+    def instrument_httpx(self, client: Any) -> None:
+        """Record every request sent by a synchronous httpx.Client (e.g. supabase-py's)."""
+        send = client.send
+
+        def timed_send(request, **kwargs):
+            started = time.perf_counter()
+            try:
+                response = send(request, **kwargs)
+            except Exception as e:
+                self.record(request.method, str(request.url), time.perf_counter() - started,
+                            sent=_body_size(request), error=e)
+                raise
+            if kwargs.get("stream"):
+                received = int(response.headers.get("content-length") or 0)
+                body = None
+            else:
+                body = response.content
+                received = len(body)
+            self.record(request.method, str(request.url), time.perf_counter() - started,
+                        sent=_body_size(request), received=received, status=response.status_code, body=body)
+            return response
+
+        client.send = timed_send
+
+    def report(self, **run_info: Any) -> Dict[str, Any]:
+        """The run report as a JSON-ready dict; run_info is stored under "run"."""
+        with self._lock:
+            stats = dict(self._stats)
+            rows = {stage: dict(tables) for stage, tables in self._rows.items()}
+            stage_seconds = dict(self._stage_seconds)
+        elapsed = time.perf_counter() - self.started
+
+        stages: Dict[str, Dict[str, Any]] = {}
+        endpoints: Dict[str, RequestStats] = {}
+        stage_totals: Dict[str, RequestStats] = {}
+        total = RequestStats()
+        for (stage, endpoint), entry in sorted(stats.items()):
+            stage_totals.setdefault(stage, RequestStats()).merge(entry)
+            endpoints.setdefault(endpoint, RequestStats()).merge(entry)
+            total.merge(entry)
+            stages.setdefault(stage, {"endpoints": {}})["endpoints"][endpoint] = entry.to_dict()
+        for stage in set(stage_totals) | set(rows) | set(stage_seconds):
+            entry = stages.setdefault(stage, {"endpoints": {}})
+            entry.update(stage_totals.get(stage, RequestStats()).to_dict())
+            seconds = stage_seconds.get(stage, elapsed)
+            written = sum(rows.get(stage, {}).values())
+            entry["seconds"] = round(seconds, 3)
+            entry["rows"] = rows.get(stage, {})
+            entry["rows_per_s"] = round(written / seconds, 1) if seconds > 0 else 0.0
+
+        written = sum(sum(tables.values()) for tables in rows.values())
+        return {
+            "run": {"started_at": self.started_at.isoformat(timespec="seconds"), "seconds": round(elapsed, 3),
+                    **run_info},
+            "totals": {**total.to_dict(), "rows": written,
+                       "rows_per_s": round(written / elapsed, 1) if elapsed > 0 else 0.0},
+            "stages": stages,
+            "endpoints": {endpoint: entry.to_dict() for endpoint, entry in endpoints.items()},
+        }
+
+    def print_report(self) -> None:
+        """Print per-endpoint counts, errors and latency percentiles."""
+        report = self.report()
+        if not report["endpoints"]:
+            return
+        print("Requests:")
+        print(f"  {'endpoint':38s} {'reqs':>6s} {'errs':>5s} {'sent':>9s} {'recv':>9s} "
+              f"{'p50':>8s} {'p95':>8s} {'p99':>8s}")
+        for endpoint, entry in sorted(report["endpoints"].items(), key=lambda item: -item[1]["requests"]):
+            latency = entry["latency_ms"]
+            print(f"  {endpoint[:38]:38s} {entry['requests']:6d} {entry['errors']:5d} "
+                  f"{_size(entry['bytes_sent']):>9s} {_size(entry['bytes_received']):>9s} "
+                  f"{latency['p50']:6.0f}ms {latency['p95']:6.0f}ms {latency['p99']:6.0f}ms")
+            for name, count in sorted(entry["error_classes"].items(), key=lambda item: -item[1]):
+                print(f"      {count:6d} × {name}")
+        busy = {stage: entry for stage, entry in report["stages"].items() if entry["rows"]}
+        if busy:
+            print("Rows per stage:")
+            for stage, entry in sorted(busy.items(), key=lambda item: -item[1]["seconds"]):
+                print(f"  {stage:20s} {sum(entry['rows'].values()):8d} rows in {entry['seconds']:7.2f}s "
+                      f"({entry['rows_per_s']:.0f} rows/s)")
+
+    def write_report(self, path: str, **run_info: Any) -> None:
+        """Write report(**run_info) to path as indented JSON with sorted keys."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(**run_info), f, indent=2, sort_keys=True, default=str)
+            f.write("\n")
+
+
+def _size(count: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if count < 1024:
+            return f"{count:.0f}{unit}" if unit == "B" else f"{count:.1f}{unit}"
+        count /= 1024
+    return f"{count:.1f}GB"
@@ -0,0 +1,149 @@
+"""
+Unit tests for HttpCache (http_cache.py) against a stub HTTP client.
+
+Run from the repository root:
+    python -m unittest discover scripts
+"""
+
+import io
+import os
+import tempfile
+import unittest
+from typing import Dict, List, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from http_cache import HttpCache, cache_key
+
+
+class StubServer:
+    """Stands in for HttpClient: serves bodies with an ETag and answers If-None-Match with 304."""
+
+    def __init__(self):
+        self.bodies: Dict[str, bytes] = {}
+        self.validators = True
+        self.requests: List[Dict[str, str]] = []
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> requests.Response:
+        headers = dict(headers or {})
+        self.requests.append(headers)
+        path = url.split("?")[0]
+        body = self.bodies[path]
+        etag = f'"{len(body)}-{hash(body) & 0xffff:x}"'
+        response = requests.Response()
+        response.url = url
+        response.headers = CaseInsensitiveDict({"Content-Length": str(len(body))})
+        if self.validators:
+            response.headers["ETag"] = etag
+        if self.validators and headers.get("If-None-Match") == etag:
+            response.status_code = 304
+            response.raw = io.BytesIO(b"")
+        else:
+            response.status_code = 200
+            response.raw = io.BytesIO(body)
+        return response
+
+
+class HttpCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.server = StubServer()
+
+    def open_cache(self, max_bytes: int = 2**20) -> HttpCache:
+        return HttpCache(self.directory.name, max_bytes=max_bytes)
+
+    def leftovers(self) -> List[str]:
+        return [name for name in os.listdir(self.directory.name) if name.startswith(".tmp-")]
+
+    def test_unchanged_body_is_revalidated_with_304(self):
+        self.server.bodies["https://example.com/a.pdf"] = b"%PDF first"
+        cache = self.open_cache()
+        self.assertEqual(cache.get(self.server, "https://example.com/a.pdf").content, b"%PDF first")
+        response = cache.get(self.server, "https://example.com/a.pdf")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"%PDF first")
+        self.assertEqual(response.headers["x-cache"], "revalidated")
+        self.assertIn("If-None-Match", self.server.requests[1])
+        self.assertEqual((cache.downloaded, cache.revalidated, cache.bytes_saved), (1, 1, 10))
+
+    def test_changed_body_is_downloaded_again(self):
+        self.server.bodies["https://example.com/a.pdf"] = b"%PDF first"
+        cache = self.open_cache()
+        cache.get(self.server, "https://example.com/a.pdf")
+        self.server.bodies["https://example.com/a.pdf"] = b"%PDF second version"
+        self.assertEqual(cache.get(self.server, "https://example.com/a.pdf").content, b"%PDF second version")
+        self.assertEqual((cache.downloaded, cache.revalidated), (2, 0))
+
+    def test_responses_without_validators_are_not_cached(self):
+        self.server.validators = False
+        self.server.bodies["https://example.com/a.pdf"] = b"%PDF first"
+        cache = self.open_cache()
+        cache.get(self.server, "https://example.com/a.pdf")
+        cache.get(self.server, "https://example.com/a.pdf")
+        self.assertNotIn("If-None-Match", self.server.requests[1])
+        self.assertEqual(cache.downloaded, 2)
+
+    def test_signing_parameters_are_left_out_of_the_key(self):
+        signed = "https://b.s3.amazonaws.com/a.pdf?X-Amz-Date=20240101&X-Amz-Signature=abc&versionId=1"
+        resigned = "https://b.s3.amazonaws.com/a.pdf?X-Amz-Date=20240202&X-Amz-Signature=def&versionId=1"
+        self.assertEqual(cache_key(signed), cache_key(resigned))
+        self.assertNotEqual(cache_key(signed), cache_key(signed.replace("versionId=1", "versionId=2")))
+        self.assertNotEqual(cache_key(signed), cache_key(signed.replace("a.pdf", "b.pdf")))
+
+        self.server.bodies["https://b.s3.amazonaws.com/a.pdf"] = b"%PDF signed"
+        cache = self.open_cache()
+        cache.get(self.server, signed)
+        self.assertEqual(cache.get(self.server, resigned).content, b"%PDF signed")
+        self.assertEqual(cache.revalidated, 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for name in "abc":
+            self.server.bodies[f"https://example.com/{name}.pdf"] = name.encode() * 40
+        cache = self.open_cache(max_bytes=100)
+        cache.get(self.server, "https://example.com/a.pdf")
+        cache.get(self.server, "https://example.com/b.pdf")
+        # a was used after b
+        body_a = os.path.join(self.directory.name, cache_key("https://example.com/a.pdf") + ".body")
+        body_b = os.path.join(self.directory.name, cache_key("https://example.com/b.pdf") + ".body")
+        os.utime(body_b, (1000, 1000))
+        os.utime(body_a, (2000, 2000))
+        cache.get(self.server, "https://example.com/c.pdf")
+        self.assertEqual(cache.evicted, 1)
+        self.assertTrue(os.path.exists(body_a))
+        self.assertFalse(os.path.exists(body_b))
+        self.assertEqual(cache._size, 80)
+
+    def test_streamed_body_is_cached_once_read_to_the_end(self):
+        self.server.bodies["https://example.com/a.pdf"] = b"%PDF " + b"x" * 200_000
+        cache = self.open_cache()
+        with cache.get(self.server, "https://example.com/a.pdf", stream=True) as response:
+            body = b"".join(response.iter_content(64 * 1024))
+        self.assertEqual(body, self.server.bodies["https://example.com/a.pdf"])
+        with cache.get(self.server, "https://example.com/a.pdf", stream=True) as response:
+            self.assertEqual(response.headers["x-cache"], "revalidated")
+            self.assertEqual(b"".join(response.iter_content(64 * 1024)), body)
+        self.assertEqual(self.leftovers(), [])
+
+    def test_streamed_body_closed_early_is_not_cached(self):
+        self.server.bodies["https://example.com/a.pdf"] = b"%PDF " + b"x" * 200_000
+        cache = self.open_cache()
+        with cache.get(self.server, "https://example.com/a.pdf", stream=True) as response:
+            next(response.iter_content(1024))
+        self.assertEqual(self.leftovers(), [])
+        cache.get(self.server, "https://example.com/a.pdf")
+        self.assertNotIn("If-None-Match", self.server.requests[1])
+
+    def test_leftover_temporary_files_are_deleted_on_open(self):
+        self.server.bodies["https://example.com/a.pdf"] = b"%PDF first"
+        self.open_cache().get(self.server, "https://example.com/a.pdf")
+        with open(os.path.join(self.directory.name, ".tmp-interrupted"), "wb") as f:
+            f.write(b"x" * 1000)
+        cache = self.open_cache()
+        self.assertEqual(self.leftovers(), [])
+        self.assertEqual(cache._size, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+"""
+Unit tests for AdaptiveLimiter and call_limited (http_client.py).
+
+Run from the repository root:
+    python -m unittest discover scripts
+"""
+
+import threading
+import unittest
+from unittest import mock
+
+import http_client
+from http_client import LATENCY_TOLERANCE, LATENCY_WARMUP, AdaptiveLimiter, call_limited
+
+
+class FakeClock:
+    """Stand-in for time.monotonic that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(http_client.time, "monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self, limiter: AdaptiveLimiter, latency: float = 0.1, throttled: bool = False, kind=None) -> None:
+        """One request taking latency seconds."""
+        started = limiter.acquire()
+        self.clock.now += latency
+        limiter.release(started, throttled=throttled, kind=kind)
+
+    def test_healthy_responses_grow_limit_up_to_ceiling(self):
+        limiter = AdaptiveLimiter("test", initial=4, max_limit=6)
+        self.send(limiter)
+        self.assertAlmostEqual(limiter.limit, 4.25)
+        for _ in range(100):
+            self.send(limiter)
+        self.assertEqual(limiter.limit, 6)
+        self.assertEqual(limiter.cuts, 0)
+
+    def test_throttled_response_halves_limit_down_to_floor(self):
+        limiter = AdaptiveLimiter("test", initial=8, min_limit=3)
+        self.send(limiter, throttled=True)
+        self.assertEqual(limiter.limit, 4)
+        self.clock.now += 1
+        self.send(limiter, throttled=True)
+        self.assertEqual(limiter.limit, 3)
+        self.assertEqual((limiter.throttled, limiter.cuts), (2, 2))
+
+    def test_one_cut_per_window(self):
+        limiter = AdaptiveLimiter("test", initial=8)
+        first, second = limiter.acquire(), limiter.acquire()
+        self.clock.now += 0.1
+        limiter.release(first, throttled=True)
+        limiter.release(second, throttled=True)
+        # Both were sent before the first cut: the second is not counted again
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual(limiter.cuts, 1)
+        self.send(limiter, throttled=True)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_latency_spike_halves_limit_after_warmup(self):
+        limiter = AdaptiveLimiter("test", initial=8, max_limit=8)
+        for _ in range(LATENCY_WARMUP):
+            self.send(limiter, latency=0.1)
+        self.send(limiter, latency=0.1 * LATENCY_TOLERANCE * 2)
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual((limiter.throttled, limiter.cuts), (0, 1))
+
+    def test_slow_responses_are_not_judged_during_warmup(self):
+        limiter = AdaptiveLimiter("test", initial=8, max_limit=8)
+        self.send(limiter, latency=0.1)
+        self.send(limiter, latency=0.1 * LATENCY_TOLERANCE * 2)
+        self.assertEqual(limiter.limit, 8)
+
+    def test_latency_baseline_is_kept_per_kind(self):
+        limiter = AdaptiveLimiter("test", initial=8, max_limit=8)
+        for _ in range(LATENCY_WARMUP):
+            self.send(limiter, latency=0.1, kind="GET")
+        for _ in range(LATENCY_WARMUP):
+            self.send(limiter, latency=2.0, kind="insert:posts")
+        self.assertEqual(limiter.cuts, 0)
+        self.send(limiter, latency=2.0, kind="GET")
+        self.assertEqual(limiter.cuts, 1)
+
+    def test_acquire_waits_for_a_free_slot(self):
+        limiter = AdaptiveLimiter("test", initial=2)
+        held = [limiter.acquire(), limiter.acquire()]
+        acquired = threading.Event()
+
+        def third():
+            limiter.release(limiter.acquire())
+            acquired.set()
+
+        thread = threading.Thread(target=third)
+        thread.start()
+        self.assertFalse(acquired.wait(0.05))
+        limiter.release(held.pop())
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+        self.assertEqual(limiter.peak, 2)
+
+    def test_configure_before_traffic_sets_start_and_ceiling(self):
+        limiter = AdaptiveLimiter("test", initial=8, max_limit=32)
+        self.assertEqual(limiter.configure(2, 8), 8)
+        self.assertEqual((limiter.limit, limiter.max_limit), (2, 8))
+
+    def test_configure_lowers_ceiling_and_cuts_limit(self):
+        # Regression: configure used to keep the higher of the old and new ceilings
+        limiter = AdaptiveLimiter("test", initial=8, max_limit=32)
+        for _ in range(200):
+            self.send(limiter)
+        self.assertGreater(limiter.limit, 20)
+        self.assertEqual(limiter.configure(1, 4), 4)
+        self.assertEqual((limiter.limit, limiter.max_limit), (4, 4))
+
+    def test_configure_after_traffic_keeps_limit(self):
+        limiter = AdaptiveLimiter("test", initial=4, max_limit=16)
+        self.send(limiter, throttled=True)
+        self.assertEqual(limiter.configure(8, 64), 64)
+        self.assertEqual((limiter.limit, limiter.max_limit), (2, 64))
+
+    def test_configure_never_goes_below_floor_or_start(self):
+        limiter = AdaptiveLimiter("test", initial=4, min_limit=2)
+        self.assertEqual(limiter.configure(1, 1), 2)
+        self.assertEqual(limiter.configure(6, 3), 6)
+
+
+class ReadTimeout(Exception):
+    pass
+
+
+class TooManyRequests(Exception):
+    code = "429"
+
+
+class CallLimitedTest(unittest.TestCase):
+    def test_throttle_errors_are_retried(self):
+        limiter = AdaptiveLimiter("test", initial=4)
+        outcomes = [TooManyRequests("slow down"), TooManyRequests("slow down"), "ok"]
+
+        def call():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        self.assertEqual(call_limited(limiter, call, backoff=0), "ok")
+        self.assertEqual(limiter.throttled, 2)
+
+    def test_timeouts_are_reported_but_not_retried(self):
+        limiter = AdaptiveLimiter("test", initial=4)
+        calls = []
+
+        def call():
+            calls.append(1)
+            raise ReadTimeout("read timed out")
+
+        with self.assertRaises(ReadTimeout):
+            call_limited(limiter, call, backoff=0)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((limiter.throttled, limiter.limit), (1, 2))
+
+    def test_other_errors_are_raised_at_once(self):
+        limiter = AdaptiveLimiter("test", initial=4)
+
+        def call():
+            raise ValueError("bad row")
+
+        with self.assertRaises(ValueError):
+            call_limited(limiter, call, backoff=0)
+        self.assertEqual((limiter.requests, limiter.throttled, limiter.cuts), (1, 0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
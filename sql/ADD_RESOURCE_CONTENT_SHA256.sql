@@ -0,0 +1,8 @@
+-- Add content_sha256 for resources uploaded by scripts/scrape_event_guidelines.py
+-- The scraper skips the upload and the row update when a fetched PDF hashes to the stored value
+-- Run in Supabase SQL Editor
+
+ALTER TABLE public.resources
+ADD COLUMN IF NOT EXISTS content_sha256 text;
+
+COMMENT ON COLUMN public.resources.content_sha256 IS 'Hex SHA-256 of the file at storage_path, as last uploaded. Used to skip re-uploading unchanged files.';
@@ -68,6 +68,9 @@ DROP FUNCTION IF EXISTS public.update_school_member_count() CASCADE;
 DROP FUNCTION IF EXISTS public.update_post_like_count() CASCADE;
 DROP FUNCTION IF EXISTS public.update_post_comment_count() CASCADE;
 DROP FUNCTION IF EXISTS public.update_student_follower_count() CASCADE;
+DROP FUNCTION IF EXISTS public.set_counter_triggers(boolean) CASCADE;
+DROP FUNCTION IF EXISTS public.recompute_counters() CASCADE;
+DROP FUNCTION IF EXISTS public.truncate_tables(text[]) CASCADE;
 
 -- 4. Drop all tables (in reverse order of dependencies)
 DROP TABLE IF EXISTS public.messages CASCADE;
@@ -0,0 +1,36 @@
+-- Keep schools.member_count right when a student's school_id changes
+-- handle_new_user creates each students row without a school; the profile
+-- (including school_id) is written afterwards as an update, which the
+-- INSERT/DELETE-only trigger never counted
+-- Run in Supabase SQL Editor
+
+CREATE OR REPLACE FUNCTION public.update_school_member_count()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    UPDATE public.schools SET member_count = member_count + 1 WHERE id = NEW.school_id;
+  ELSIF TG_OP = 'DELETE' THEN
+    UPDATE public.schools SET member_count = member_count - 1 WHERE id = OLD.school_id;
+  ELSIF OLD.school_id IS DISTINCT FROM NEW.school_id THEN
+    UPDATE public.schools SET member_count = member_count - 1 WHERE id = OLD.school_id;
+    UPDATE public.schools SET member_count = member_count + 1 WHERE id = NEW.school_id;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS school_member_count_trigger ON public.students;
+CREATE TRIGGER school_member_count_trigger
+  AFTER INSERT OR DELETE OR UPDATE OF school_id ON public.students
+  FOR EACH ROW EXECUTE FUNCTION public.update_school_member_count();
+
+-- Repair counts left behind by profiles written before this fix
+UPDATE public.schools sc
+SET member_count = c.member_count
+FROM (
+  SELECT schools.id, COUNT(students.id)::integer AS member_count
+  FROM public.schools
+  LEFT JOIN public.students ON students.school_id = schools.id
+  GROUP BY schools.id
+) c
+WHERE sc.id = c.id AND sc.member_count IS DISTINCT FROM c.member_count;
@@ -0,0 +1,100 @@
+-- Bulk-load support for scripts/seed.py.
+-- Lets the seeder switch off the per-row counter triggers for a large load
+-- (--defer-triggers), rebuild every counter afterwards with set-based updates,
+-- and reset all tables with a single TRUNCATE. Run this if you have an existing
+-- DB and don't reset from schema.sql.
+
+CREATE OR REPLACE FUNCTION public.set_counter_triggers(enabled boolean)
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  action text := CASE WHEN enabled THEN 'ENABLE' ELSE 'DISABLE' END;
+BEGIN
+  EXECUTE format('ALTER TABLE public.likes %s TRIGGER post_like_count_trigger', action);
+  EXECUTE format('ALTER TABLE public.comments %s TRIGGER post_comment_count_trigger', action);
+  EXECUTE format('ALTER TABLE public.students %s TRIGGER school_member_count_trigger', action);
+  EXECUTE format('ALTER TABLE public.student_follows %s TRIGGER student_follow_count_trigger', action);
+END;
+$$;
+
+-- Recompute like/comment, follower/following and member counts from the rows
+-- themselves. Only rows whose counter is off are written.
+CREATE OR REPLACE FUNCTION public.recompute_counters()
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  UPDATE public.posts p
+  SET like_count = c.like_count, comment_count = c.comment_count
+  FROM (
+    SELECT posts.id,
+           COALESCE(l.n, 0)::integer AS like_count,
+           COALESCE(m.n, 0)::integer AS comment_count
+    FROM public.posts
+    LEFT JOIN (SELECT post_id, count(*) AS n FROM public.likes GROUP BY post_id) l ON l.post_id = posts.id
+    LEFT JOIN (SELECT post_id, count(*) AS n FROM public.comments GROUP BY post_id) m ON m.post_id = posts.id
+  ) c
+  WHERE p.id = c.id
+    AND (p.like_count IS DISTINCT FROM c.like_count OR p.comment_count IS DISTINCT FROM c.comment_count);
+
+  UPDATE public.students s
+  SET follower_count = c.follower_count, following_count = c.following_count
+  FROM (
+    SELECT students.id,
+           COALESCE(ers.n, 0)::integer AS follower_count,
+           COALESCE(ing.n, 0)::integer AS following_count
+    FROM public.students
+    LEFT JOIN (SELECT following_id, count(*) AS n FROM public.student_follows GROUP BY following_id) ers
+      ON ers.following_id = students.id
+    LEFT JOIN (SELECT follower_id, count(*) AS n FROM public.student_follows GROUP BY follower_id) ing
+      ON ing.follower_id = students.id
+  ) c
+  WHERE s.id = c.id
+    AND (s.follower_count IS DISTINCT FROM c.follower_count OR s.following_count IS DISTINCT FROM c.following_count);
+
+  UPDATE public.schools sc
+  SET member_count = c.member_count
+  FROM (
+    SELECT schools.id, COALESCE(m.n, 0)::integer AS member_count
+    FROM public.schools
+    LEFT JOIN (SELECT school_id, count(*) AS n FROM public.students GROUP BY school_id) m ON m.school_id = schools.id
+  ) c
+  WHERE sc.id = c.id AND sc.member_count IS DISTINCT FROM c.member_count;
+END;
+$$;
+
+-- Empty the given public tables in one statement (seed.py reset). Names that do
+-- not exist on this database are skipped; returns how many tables were emptied.
+CREATE OR REPLACE FUNCTION public.truncate_tables(tables text[])
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  targets text;
+  emptied integer;
+BEGIN
+  SELECT string_agg(format('public.%I', t), ', ' ORDER BY ord), count(*)
+  INTO targets, emptied
+  FROM unnest(tables) WITH ORDINALITY AS u(t, ord)
+  WHERE to_regclass(format('public.%I', t)) IS NOT NULL;
+  IF targets IS NOT NULL THEN
+    EXECUTE 'TRUNCATE TABLE ' || targets || ' RESTART IDENTITY CASCADE';
+  END IF;
+  RETURN emptied;
+END;
+$$;
+
+-- Seeding runs with the service role; nobody else may toggle triggers or truncate
+REVOKE ALL ON FUNCTION public.set_counter_triggers(boolean) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION public.recompute_counters() FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION public.truncate_tables(text[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.set_counter_triggers(boolean) TO service_role;
+GRANT EXECUTE ON FUNCTION public.recompute_counters() TO service_role;
+GRANT EXECUTE ON FUNCTION public.truncate_tables(text[]) TO service_role;
@@ -384,6 +384,7 @@ export interface Resource {
   type: ResourceType;
   url: string | null;
   storage_path?: string | null; // Path in resources bucket (e.g., Accounting/guidelines.pdf)
+  content_sha256?: string | null; // SHA-256 of the stored file, set by the guidelines scraper
   event_name: string | null; // Links to FBLA event name
   category_id: string | null;
   downloads: number;
@@ -398,6 +399,7 @@ export interface ResourceInsert {
   type: ResourceType;
   url?: string | null;
   storage_path?: string | null;
+  content_sha256?: string | null;
   event_name?: string | null;
   category_id?: string | null;
   downloads?: number;
@@ -411,6 +413,7 @@ export interface ResourceUpdate {
   type?: ResourceType;
   url?: string | null;
   storage_path?: string | null;
+  content_sha256?: string | null;
   event_name?: string | null;
   category_id?: string | null;
   downloads?: number;